@@ -1,184 +1,449 @@
 import os
+import logging
 from dotenv import load_dotenv
+import orjson
 import requests
-from flask import Flask, request, jsonify
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from flask import Flask, request, jsonify, Response, stream_with_context
+from flask.json.provider import JSONProvider
+from flask_compress import Compress
 from flask_cors import CORS
 import chromadb
 from chromadb.config import Settings
+from chromadb.utils import embedding_functions
 import shutil
+import sqlite3
+import hashlib
+import mmap
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from collections import OrderedDict
+from functools import lru_cache
+
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
+log = logging.getLogger("andy")
 
 # Error handling for optional dependencies
 try:
     import tiktoken
-    print("tiktoken available")
+    log.info("tiktoken available")
 except ImportError:
-    print("tiktoken not available - running without token counting")
+    log.info("tiktoken not available - running without token counting")
     tiktoken = None
 
 try:
     import langchain
-    print("langchain available")
+    log.info("langchain available")
 except ImportError:
-    print("langchain not available - running without langchain features")
+    log.info("langchain not available - running without langchain features")
     langchain = None
 
+try:
+    import faiss
+    import numpy as np
+    log.info("faiss available")
+except ImportError:
+    log.info("faiss not available - using ChromaDB for retrieval")
+    faiss = None
+
 try:
     import transformers
-    print("transformers available")
+    log.info("transformers available")
 except ImportError:
-    print("transformers not available")
+    log.info("transformers not available")
     transformers = None
 
+# Paths resolved once at import time
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DOC_PATH_MYDATA = os.path.join(BASE_DIR, "my_data", "MLTrainingDoc.txt")
+DOC_PATH_CUR = os.path.join(BASE_DIR, "MLTrainingDoc.txt")
+CHROMA_PATH = os.path.join(BASE_DIR, "chroma_db")
+DOC_STATUS_TTL = 5  # seconds
+
+DEEPSEEK_URL = "https://api.deepseek.com/v1/chat/completions"
+
+# Shared HTTP session - keeps connections to DeepSeek alive and retries connection
+# errors and retryable status codes
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    max_retries=Retry(
+        total=2,
+        read=0,  # never resend a POST that may already be generating (and billed)
+        backoff_factor=0.2,
+        status_forcelist=[429, 502, 503, 504],
+        allowed_methods=["POST"],
+        raise_on_status=False
+    )
+))
+SESSION.headers.update({"Content-Type": "application/json"})
+
 # Load environment variables
 def load_environment():
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    env_path = os.path.join(current_dir, '.env')
+    env_path = os.path.join(BASE_DIR, '.env')
     
-    print(f"Loading .env from: {env_path}")
-    print(f"Current working directory: {os.getcwd()}")
-    print(f".env file exists: {os.path.exists(env_path)}")
+    log.info("Loading .env from: %s", env_path)
+    log.debug("Current working directory: %s", os.getcwd())
+    log.debug(".env file exists: %s", os.path.exists(env_path))
     
     load_dotenv(env_path)
     
     api_key = os.getenv('DEEPSEEK_API_KEY')
-    print(f"DEEPSEEK_API_KEY from env: {repr(api_key)}")
+    log.debug("DEEPSEEK_API_KEY from env: %s", api_key[:10] + '...' if api_key else None)
     
     if not api_key or api_key == 'your_deepseek_api_key_here':
-        print("ERROR: DEEPSEEK_API_KEY not properly set in .env file")
+        log.error("DEEPSEEK_API_KEY not properly set in .env file")
         return False
     return True
 
-# Test DeepSeek API key
+# Test DeepSeek API key - called lazily from /api/health?deep=1, result cached
+_KEY_OK = None
+
+@lru_cache(maxsize=1)
 def test_deepseek_key(api_key):
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
+    headers = {"Authorization": f"Bearer {api_key}"}
     
     payload = {
         "model": "deepseek-chat",
         "messages": [{"role": "user", "content": "Hello, are you working?"}],
         "temperature": 0.7,
-        "max_tokens": 50
+        "max_tokens": 1
     }
     
     try:
-        response = requests.post(
-            "https://api.deepseek.com/v1/chat/completions",
+        response = SESSION.post(
+            DEEPSEEK_URL,
             headers=headers,
             json=payload,
             timeout=10
         )
-        print(f"Status: {response.status_code}")
+        log.debug("Status: %s", response.status_code)
         if response.status_code == 200:
-            print("API key is working!")
+            log.info("API key is working!")
             return True
         else:
-            print(f"API error: {response.text}")
+            log.error("API error: %s", response.text)
             return False
     except Exception as e:
-        print(f"Error: {e}")
+        log.error("Error: %s", e)
         return False
 
+# Embedding function - pinned explicitly so a ChromaDB upgrade can't silently
+# switch models and invalidate the stored vectors
+EMBED_FN = embedding_functions.ONNXMiniLM_L6_V2()
+
+# ChromaDB client - uses a standalone Chroma server when CHROMA_HOST is set so
+# multiple workers share one index, otherwise an embedded on-disk database
+def create_chroma_client():
+    chroma_host = os.getenv('CHROMA_HOST')
+    if chroma_host:
+        return chromadb.HttpClient(host=chroma_host, port=int(os.getenv('CHROMA_PORT', '8001')))
+    return chromadb.PersistentClient(path=CHROMA_PATH)
+
 # ChromaDB setup - Fixed version
 def setup_chromadb():
     try:
-        # Use absolute path to avoid issues
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        chroma_path = os.path.join(current_dir, "chroma_db")
-        
-        # Clean up any existing problematic database
-        if os.path.exists(chroma_path):
-            try:
-                shutil.rmtree(chroma_path)
-                print("Removed old ChromaDB database due to version incompatibility")
-            except Exception as e:
-                print(f"Error removing old database: {e}")
+        client = create_chroma_client()
         
-        client = chromadb.PersistentClient(path=chroma_path)
-        
-        # List all available collections
-        collections = client.list_collections()
-        print(f"Available collections: {[col.name for col in collections]}")
-        
-        # Try to get existing collection or create new one
-        try:
-            collection = client.get_collection("andy_knowledge_base")
-            print("Connected to existing collection: andy_knowledge_base")
-        except:
-            collection = client.create_collection("andy_knowledge_base")
-            print("Created new collection: andy_knowledge_base")
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Available collections: %s", [col.name for col in client.list_collections()])
         
+        collection = client.get_or_create_collection("andy_knowledge_base", embedding_function=EMBED_FN)
+        log.info("Connected to collection: andy_knowledge_base")
         return collection
         
     except Exception as e:
-        print(f"Error setting up ChromaDB: {e}")
-        # Try to create a simple client without complex operations
+        log.error("Error setting up ChromaDB: %s", e)
+        # Only remove the on-disk database once it has actually failed to open,
+        # e.g. because it was written by an incompatible ChromaDB version
         try:
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            chroma_path = os.path.join(current_dir, "chroma_db")
-            client = chromadb.PersistentClient(path=chroma_path)
-            collection = client.create_collection("andy_knowledge_base")
-            print("Created basic ChromaDB collection after initial error")
+            if not os.getenv('CHROMA_HOST') and os.path.exists(CHROMA_PATH):
+                shutil.rmtree(CHROMA_PATH)
+                log.warning("Removed old ChromaDB database due to version incompatibility")
+            client = create_chroma_client()
+            collection = client.get_or_create_collection("andy_knowledge_base", embedding_function=EMBED_FN)
+            log.info("Created basic ChromaDB collection after initial error")
             return collection
         except Exception as inner_e:
-            print(f"Failed to create ChromaDB collection: {inner_e}. Running without vector database.")
+            log.error("Failed to create ChromaDB collection: %s. Running without vector database.", inner_e)
             return None
 
+# Split document into chunks - token-aware with overlap when tiktoken is available
+CHUNK_TOKENS = 512
+CHUNK_OVERLAP_TOKENS = 64
+CHUNK_CHARS = 1000
+
+# Encoding for token chunking, or None when tiktoken is missing or the encoding can't load
+@lru_cache(maxsize=1)
+def get_chunk_encoding():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        log.warning("tiktoken encoding unavailable: %s. Falling back to character chunks.", e)
+        return None
+
+# Chunking mode split_into_chunks is expected to use ("tokens" or "chars")
+def chunking_mode():
+    return "tokens" if get_chunk_encoding() is not None else "chars"
+
+# Returns (chunks, metadatas, mode) - mode is the chunking that actually ran
+def split_into_chunks(content):
+    chunks, metadatas, mode = None, None, "chars"
+    
+    enc = get_chunk_encoding()
+    if enc is not None:
+        try:
+            # encode_ordinary skips the special-token scan (and can't fail on "<|endoftext|>"
+            # in the document); decode_batch decodes all windows in one call
+            tokens = enc.encode_ordinary(content)
+            step = CHUNK_TOKENS - CHUNK_OVERLAP_TOKENS
+            starts = range(0, max(len(tokens) - CHUNK_OVERLAP_TOKENS, 1), step)
+            chunks = enc.decode_batch([tokens[i:i+CHUNK_TOKENS] for i in starts])
+            metadatas = [{"start_tok": i} for i in starts]
+            mode = "tokens"
+        except Exception as e:
+            log.warning("Token-aware chunking failed: %s. Falling back to character chunks.", e)
+            chunks = None
+    
+    if chunks is None:
+        starts = range(0, len(content), CHUNK_CHARS)
+        chunks = [content[i:i+CHUNK_CHARS] for i in starts]
+        metadatas = [{"start_char": i} for i in starts]
+    
+    # Remove empty chunks
+    kept = [i for i, chunk in enumerate(chunks) if chunk.strip()]
+    return [chunks[i] for i in kept], [metadatas[i] for i in kept], mode
+
+# Hash the document (and chunking mode/settings) without reading it into a Python string
+def hash_document(path, mode):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size > 0:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                digest.update(mapped)
+    digest.update(f"|{mode}|{CHUNK_TOKENS}|{CHUNK_OVERLAP_TOKENS}|{CHUNK_CHARS}".encode())
+    return digest.hexdigest()
+
+INGEST_BATCH_SIZE = 128
+
+# Hash of the currently indexed document - response cache entries are tagged with
+# it so answers built from an older version of the document are never served
+DOC_HASH = ""
+
+# Look for MLTrainingDoc.txt in my_data folder first, then current directory
+def find_document():
+    doc_paths = [
+        DOC_PATH_MYDATA,  # First check my_data folder
+        DOC_PATH_CUR  # Then check current directory
+    ]
+    
+    for path in doc_paths:
+        if os.path.exists(path):
+            return path
+    return None
+
 # Load document into ChromaDB - UPDATED TO CHECK my_data FOLDER
 def load_document_to_chroma(collection):
+    global DOC_HASH
     try:
-        # Look for MLTrainingDoc.txt in my_data folder first, then current directory
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        doc_paths = [
-            os.path.join(current_dir, "my_data", "MLTrainingDoc.txt"),  # First check my_data folder
-            os.path.join(current_dir, "MLTrainingDoc.txt")  # Then check current directory
-        ]
-        
-        doc_path = None
-        for path in doc_paths:
-            if os.path.exists(path):
-                doc_path = path
-                break
-        
+        doc_path = find_document()
         if not doc_path:
-            print("MLTrainingDoc.txt not found in my_data folder or current directory. Running without document context.")
+            log.warning("MLTrainingDoc.txt not found in my_data folder or current directory. Running without document context.")
             return
         
-        print(f"Found document at: {doc_path}")
+        log.info("Found document at: %s", doc_path)
+        
+        # Skip re-indexing when the same document was already loaded by a previous run.
+        # The hash lives in the collection metadata so it also describes a shared Chroma server.
+        expected_mode = chunking_mode()
+        doc_hash = hash_document(doc_path, expected_mode)
+        DOC_HASH = doc_hash
+        existing_count = collection.count()
+        if existing_count > 0 and (collection.metadata or {}).get("doc_sha256") == doc_hash:
+            log.info("Document already loaded with %d chunks", existing_count)
+            return
         
         with open(doc_path, 'r', encoding='utf-8') as file:
             content = file.read()
         
         if not content.strip():
-            print("MLTrainingDoc.txt is empty. Running without document context.")
+            log.warning("MLTrainingDoc.txt is empty. Running without document context.")
             return
         
-        # Split into chunks (simple implementation)
-        chunk_size = 1000
-        chunks = [content[i:i+chunk_size] for i in range(0, len(content), chunk_size)]
-        chunks = [chunk for chunk in chunks if chunk.strip()]  # Remove empty chunks
+        chunks, metadatas, mode = split_into_chunks(content)
+        if mode != expected_mode:
+            # Token chunking failed mid-way - record the chunks that were actually stored
+            doc_hash = hash_document(doc_path, mode)
+            DOC_HASH = doc_hash
         
-        # Add to ChromaDB if not already loaded
+        # Add to ChromaDB, replacing chunks from an older version of the document
         try:
-            existing_ids = collection.get()['ids']
-            if not existing_ids:
-                ids = [f"chunk_{i}" for i in range(len(chunks))]
-                collection.add(
-                    documents=chunks,
-                    ids=ids
+            if existing_count > 0:
+                collection.delete(ids=collection.get(include=[])['ids'])
+                log.info("Document changed, removed %d old chunks", existing_count)
+            
+            # Embed and insert in batches to bound memory and amortize index inserts.
+            # upsert keeps this idempotent if several workers re-index a shared server at once.
+            for start in range(0, len(chunks), INGEST_BATCH_SIZE):
+                batch = chunks[start:start+INGEST_BATCH_SIZE]
+                collection.upsert(
+                    documents=batch,
+                    embeddings=EMBED_FN(batch),
+                    metadatas=metadatas[start:start+INGEST_BATCH_SIZE],
+                    ids=[f"chunk_{start+j}" for j in range(len(batch))]
                 )
-                print(f"Loaded {len(chunks)} chunks into ChromaDB from {os.path.basename(doc_path)}")
-            else:
-                print(f"Document already loaded with {len(existing_ids)} chunks")
+            log.info("Loaded %d chunks into ChromaDB from %s", len(chunks), os.path.basename(doc_path))
+            
+            collection.modify(metadata={
+                **(collection.metadata or {}),
+                "doc_sha256": doc_hash,
+                "chunk_mode": mode,
+                "chunk_count": len(chunks)
+            })
         except Exception as e:
-            print(f"Error adding documents to ChromaDB: {e}. Continuing without document context.")
+            log.error("Error adding documents to ChromaDB: %s. Continuing without document context.", e)
             
     except Exception as e:
-        print(f"Error loading document: {e}. Running without document context.")
+        log.error("Error loading document: %s. Running without document context.", e)
+
+# FAISS knowledge base - optional alternative to the Chroma collection (USE_FAISS=1).
+# Chunk vectors live in a flat inner-product index and chunk text in SQLite.
+USE_FAISS = os.getenv("USE_FAISS") == "1"
+FAISS_DIR = os.path.join(BASE_DIR, "faiss_index")
+# Memory-map the stored vectors instead of reading them into RAM (IO_FLAG_MMAP_IFC
+# covers flat indexes and only exists in newer faiss releases)
+FAISS_MMAP_FLAGS = (faiss.IO_FLAG_MMAP | getattr(faiss, "IO_FLAG_MMAP_IFC", 0)) if faiss is not None else 0
+
+class FaissKnowledgeBase:
+    # Implements the subset of the Chroma collection API used by the chat path.
+    # query() returns cosine distances (1 - cosine similarity).
+    distance_space = "cosine"
+    
+    def __init__(self, index, db_path):
+        self.index = index
+        self.db_path = db_path
+    
+    def count(self):
+        return self.index.ntotal
+    
+    def query(self, query_embeddings, n_results=10, include=None):
+        vectors = np.asarray(query_embeddings, dtype='float32')
+        faiss.normalize_L2(vectors)
+        scores, rows = self.index.search(vectors, min(n_results, self.index.ntotal))
+        
+        results = {'ids': [], 'documents': [], 'distances': []}
+        conn = sqlite3.connect(self.db_path)
+        try:
+            for row_scores, row_ids in zip(scores, rows):
+                ids = [int(i) for i in row_ids if i >= 0]
+                texts = dict(conn.execute(
+                    f"SELECT id, text FROM chunks WHERE id IN ({','.join('?' * len(ids))})", ids
+                ).fetchall()) if ids else {}
+                results['ids'].append([f"chunk_{i}" for i in ids])
+                results['documents'].append([texts.get(i, "") for i in ids])
+                results['distances'].append([1.0 - float(score) for score in row_scores[:len(ids)]])
+        finally:
+            conn.close()
+        return results
+
+def setup_faiss():
+    global DOC_HASH
+    index_path = os.path.join(FAISS_DIR, "andy.faiss")
+    db_path = os.path.join(FAISS_DIR, "andy.db")
+    sidecar = os.path.join(FAISS_DIR, ".doc_sha256")
+    
+    try:
+        doc_path = find_document()
+        if not doc_path:
+            log.warning("MLTrainingDoc.txt not found in my_data folder or current directory. Running without document context.")
+            return None
+        
+        # Reuse the index from a previous run when the document hasn't changed
+        expected_mode = chunking_mode()
+        doc_hash = hash_document(doc_path, expected_mode)
+        DOC_HASH = doc_hash
+        if os.path.exists(index_path) and os.path.exists(db_path) and os.path.exists(sidecar):
+            with open(sidecar, 'r') as file:
+                if file.read().split()[:1] == [doc_hash]:
+                    index = faiss.read_index(index_path, FAISS_MMAP_FLAGS)
+                    log.info("Loaded FAISS index with %d chunks", index.ntotal)
+                    return FaissKnowledgeBase(index, db_path)
+        
+        with open(doc_path, 'r', encoding='utf-8') as file:
+            content = file.read()
+        
+        chunks, _, mode = split_into_chunks(content)
+        if not chunks:
+            log.warning("MLTrainingDoc.txt is empty. Running without document context.")
+            return None
+        if mode != expected_mode:
+            doc_hash = hash_document(doc_path, mode)
+            DOC_HASH = doc_hash
+        
+        vectors = np.asarray(
+            [vec for start in range(0, len(chunks), INGEST_BATCH_SIZE) for vec in EMBED_FN(chunks[start:start+INGEST_BATCH_SIZE])],
+            dtype='float32'
+        )
+        faiss.normalize_L2(vectors)
+        index = faiss.IndexFlatIP(vectors.shape[1])
+        index.add(vectors)
+        
+        # Other workers may have the current files mmapped/open, so never rewrite them in
+        # place: build each file under a temporary name in FAISS_DIR and os.replace() it in.
+        # The sidecar goes last, so it only ever vouches for a complete index and db.
+        os.makedirs(FAISS_DIR, exist_ok=True)
+        suffix = f".tmp{os.getpid()}"
+        faiss.write_index(index, index_path + suffix)
+        os.replace(index_path + suffix, index_path)
+        index = faiss.read_index(index_path, FAISS_MMAP_FLAGS)
+        
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+        conn = sqlite3.connect(db_path + suffix)
+        try:
+            with conn:
+                conn.execute("CREATE TABLE chunks (id INTEGER PRIMARY KEY, text TEXT NOT NULL)")
+                conn.executemany("INSERT INTO chunks (id, text) VALUES (?, ?)", enumerate(chunks))
+        finally:
+            conn.close()
+        os.replace(db_path + suffix, db_path)
+        
+        with open(sidecar + suffix, 'w') as file:
+            file.write(f"{doc_hash} {len(chunks)} {mode}\n")
+        os.replace(sidecar + suffix, sidecar)
+        
+        log.info("Built FAISS index with %d chunks from %s", len(chunks), os.path.basename(doc_path))
+        return FaissKnowledgeBase(index, db_path)
+        
+    except Exception as e:
+        log.error("Error setting up FAISS index: %s. Running without document context.", e)
+        return None
+
+# JSON provider backed by orjson for jsonify() and request.get_json()
+class ORJSONProvider(JSONProvider):
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
 
 # Initialize Flask app
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
+
+# Compress larger JSON responses (brotli when the client supports it, else gzip)
+app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+app.config['COMPRESS_MIN_SIZE'] = 500
+app.config['COMPRESS_STREAMS'] = False  # never buffer /api/chat/stream for compression
+Compress(app)
 
 frontend_url = "https://andy-chatbot-frontend.onrender.com"
 backend_url = "https://andy-chatbot-backend.onrender.com"
@@ -188,48 +453,192 @@ if os.environ.get('FLASK_ENV')== "production":
 else:
     CORS(app)
 
-# Load environment and test API
-print("=" * 50)
-print("Initializing backend...")
-print("=" * 50)
+# Load environment
+log.info("Initializing backend...")
 
-if load_environment():
-    api_key = os.getenv('DEEPSEEK_API_KEY')
-    if api_key:
-        print("Testing DeepSeek API key...")
-        test_deepseek_key(api_key)
+env_loaded = load_environment()
+API_KEY = os.getenv('DEEPSEEK_API_KEY')
+
+if env_loaded:
+    if API_KEY:
+        SESSION.headers.update({"Authorization": f"Bearer {API_KEY}"})
     else:
-        print("No API key found")
+        log.warning("No API key found")
 else:
-    print("Failed to load environment variables")
+    log.error("Failed to load environment variables")
 
-# Setup ChromaDB
-print("Setting up ChromaDB...")
-chroma_collection = setup_chromadb()
+if USE_FAISS and faiss is None:
+    log.warning("USE_FAISS=1 but faiss is not installed - falling back to ChromaDB")
 
-# Load document if ChromaDB is available
-if chroma_collection:
-    print("Loading document into ChromaDB...")
-    load_document_to_chroma(chroma_collection)
+if USE_FAISS and faiss is not None:
+    # Setup FAISS knowledge base (the response cache still uses ChromaDB)
+    log.info("Setting up FAISS index...")
+    chroma_collection = setup_faiss()
 else:
-    print("Running without ChromaDB vector database")
+    # Setup ChromaDB
+    log.info("Setting up ChromaDB...")
+    chroma_collection = setup_chromadb()
+    
+    # Load document if ChromaDB is available
+    if chroma_collection:
+        log.info("Loading document into ChromaDB...")
+        load_document_to_chroma(chroma_collection)
+    else:
+        log.warning("Running without ChromaDB vector database")
 
-# DeepSeek API function
-def ask_deepseek(question, context=""):
-    api_key = os.getenv('DEEPSEEK_API_KEY')
-    if not api_key:
-        return "Error: API key not configured. Please check your .env file."
+# Request-path Chroma/FAISS queries and writes run on this pool (as greenlets under gevent)
+EXECUTOR = ThreadPoolExecutor(max_workers=8)
+
+# ONNX inference for query embeddings. wsgi.py sets this to gevent's native-thread
+# executor so inference doesn't stall the worker's event loop. Only the pure
+# EMBED_FN call is sent there: once gevent has patched threading, Chroma's and
+# logging's locks are gevent locks, which are unsafe to use from native threads.
+EMBED_EXECUTOR = None
+EMBED_TIMEOUT = 10  # seconds
+
+def embed_texts(texts):
+    if EMBED_EXECUTOR is None:
+        return EMBED_FN(texts)
+    return EMBED_EXECUTOR.submit(EMBED_FN, texts).result(timeout=EMBED_TIMEOUT)
+
+# Query embeddings - computed once per distinct question and reused
+@lru_cache(maxsize=2048)
+def embed(text):
+    return tuple(embed_texts([text])[0])
+
+# Response cache - exact match (in-memory LRU) and semantic (Chroma collection)
+RESPONSE_CACHE_SIZE = 1024
+RESPONSE_CACHE_TTL = 24 * 60 * 60  # seconds
+SEMANTIC_CACHE_THRESHOLD = 0.15  # cosine distance
+SEMANTIC_CACHE_MAX_ENTRIES = 5000
+CACHE_SWEEP_INTERVAL = 60 * 60  # seconds
+
+_exact_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_last_cache_sweep = time.time()  # setup_response_cache sweeps at startup
+
+def setup_response_cache():
+    try:
+        client = create_chroma_client()
+        cache = client.get_or_create_collection(
+            "andy_response_cache",
+            embedding_function=EMBED_FN,
+            metadata={"hnsw:space": "cosine"}
+        )
+        log.info("Connected to response cache collection: andy_response_cache")
+        # Runs after (re-)indexing, so answers for an older document are dropped here
+        sweep_response_cache(cache)
+        return cache
+    except Exception as e:
+        log.error("Error setting up response cache: %s. Running without semantic cache.", e)
+        return None
+
+# Drop semantic cache entries for other document versions or past their TTL, then
+# trim the oldest entries so the collection stays under SEMANTIC_CACHE_MAX_ENTRIES
+def sweep_response_cache(cache):
+    try:
+        cache.delete(where={"doc_sha256": {"$ne": DOC_HASH}})
+        cache.delete(where={"created_at": {"$lt": time.time() - RESPONSE_CACHE_TTL}})
+        
+        overflow = cache.count() - SEMANTIC_CACHE_MAX_ENTRIES
+        if overflow > 0:
+            entries = cache.get(include=["metadatas"])
+            by_age = sorted(zip(entries['ids'], entries['metadatas']), key=lambda e: e[1].get('created_at', 0))
+            cache.delete(ids=[cache_id for cache_id, _ in by_age[:overflow]])
+        log.info("Swept response cache, %d entries remain", cache.count())
+    except Exception as e:
+        log.error("Error sweeping response cache: %s", e)
+
+def _cache_key(question, context):
+    return hashlib.sha1((question + "||" + context + "||" + DOC_HASH).encode()).hexdigest()
+
+def get_exact_cached_response(question, context=""):
+    now = time.time()
+    key = _cache_key(question, context)
     
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
+    with _cache_lock:
+        entry = _exact_cache.get(key)
+        if entry is not None:
+            answer, created_at = entry
+            if now - created_at < RESPONSE_CACHE_TTL:
+                _exact_cache.move_to_end(key)
+                return answer
+            del _exact_cache[key]
+    return None
+
+def get_semantic_cached_response(question):
+    now = time.time()
+    if not response_cache:
+        return None
     
-    system_content = "You are Andy. Answer questions about yourself based on the provided context. If the context doesn't contain relevant information, say you don't have that information rather than making things up."
-    if context:
-        system_content += f" Context: {context}"
-    else:
-        system_content += " Since no specific context was provided, answer based on your general knowledge but identify yourself as Andy."
+    # Chroma collections are thread-safe, so the semantic tier runs without _cache_lock
+    try:
+        results = response_cache.query(
+            query_embeddings=[list(embed(question))],
+            n_results=1,
+            where={"doc_sha256": DOC_HASH}
+        )
+        if not results['ids'] or not results['ids'][0]:
+            return None
+        
+        cache_id = results['ids'][0][0]
+        distance = results['distances'][0][0]
+        metadata = results['metadatas'][0][0]
+        if now - metadata.get('created_at', 0) >= RESPONSE_CACHE_TTL:
+            # Another request may have deleted or refreshed the entry already
+            try:
+                response_cache.delete(ids=[cache_id])
+            except Exception:
+                pass
+            return None
+        
+        if distance < SEMANTIC_CACHE_THRESHOLD:
+            return metadata['answer']
+    except Exception as e:
+        log.error("Error reading response cache: %s", e)
+    return None
+
+def cache_response(question, context, answer):
+    global _last_cache_sweep
+    now = time.time()
+    key = _cache_key(question, context)
+    
+    with _cache_lock:
+        _exact_cache[key] = (answer, now)
+        _exact_cache.move_to_end(key)
+        while len(_exact_cache) > RESPONSE_CACHE_SIZE:
+            _exact_cache.popitem(last=False)
+    
+    if response_cache:
+        EXECUTOR.submit(_store_semantic_response, question, answer, now)
+        
+        with _cache_lock:
+            sweep_due = now - _last_cache_sweep >= CACHE_SWEEP_INTERVAL
+            if sweep_due:
+                _last_cache_sweep = now
+        if sweep_due:
+            EXECUTOR.submit(sweep_response_cache, response_cache)
+
+def _store_semantic_response(question, answer, created_at):
+    try:
+        response_cache.upsert(
+            documents=[question],
+            embeddings=[list(embed(question))],
+            metadatas=[{"answer": answer, "created_at": created_at, "doc_sha256": DOC_HASH}],
+            ids=[hashlib.sha1(question.encode()).hexdigest()]
+        )
+    except Exception as e:
+        log.error("Error writing response cache: %s", e)
+
+log.info("Setting up response cache...")
+response_cache = setup_response_cache() if chroma_collection else None
+
+# DeepSeek API function
+SYSTEM_BASE = "You are Andy. Answer questions about yourself based on the provided context. If the context doesn't contain relevant information, say you don't have that information rather than making things up."
+SYSTEM_NO_CONTEXT = SYSTEM_BASE + " Since no specific context was provided, answer based on your general knowledge but identify yourself as Andy."
+
+def build_deepseek_body(question, context, stream=False):
+    system_content = f"{SYSTEM_BASE} Context: {context}" if context else SYSTEM_NO_CONTEXT
     
     payload = {
         "model": "deepseek-chat",
@@ -240,35 +649,149 @@ def ask_deepseek(question, context=""):
         "temperature": 0.7,
         "max_tokens": 500
     }
+    if stream:
+        payload["stream"] = True
+    return orjson.dumps(payload)
+
+def deepseek_error_message(response):
+    error_msg = f"API Error: Status {response.status_code}"
+    if response.status_code == 401:
+        error_msg += " - Invalid API key. Please check your DEEPSEEK_API_KEY in .env file."
+    elif response.status_code == 429:
+        error_msg += " - Rate limit exceeded or insufficient credits."
+    else:
+        error_msg += f" - {response.text}"
+    return error_msg
+
+def ask_deepseek(question, context=""):
+    if not API_KEY:
+        return "Error: API key not configured. Please check your .env file."
     
     try:
-        response = requests.post(
-            "https://api.deepseek.com/v1/chat/completions",
-            headers=headers,
-            json=payload,
-            timeout=30
-        )
+        response = SESSION.post(DEEPSEEK_URL, data=build_deepseek_body(question, context), timeout=30)
         
         if response.status_code == 200:
-            return response.json()["choices"][0]["message"]["content"]
+            answer = orjson.loads(response.content)["choices"][0]["message"]["content"]
+            cache_response(question, context, answer)
+            return answer
         else:
-            error_msg = f"API Error: Status {response.status_code}"
-            if response.status_code == 401:
-                error_msg += " - Invalid API key. Please check your DEEPSEEK_API_KEY in .env file."
-            elif response.status_code == 429:
-                error_msg += " - Rate limit exceeded or insufficient credits."
-            else:
-                error_msg += f" - {response.text}"
-            return error_msg
+            return deepseek_error_message(response)
             
     except Exception as e:
         return f"Network Error: {str(e)}"
 
+# Streaming DeepSeek API function - the request is sent up front so an upstream
+# error can still be reported with a proper status, then answer text is yielded
+# as it is generated. A failure after streaming has started is reported as a
+# final line starting with STREAM_ERROR_SENTINEL.
+STREAM_ERROR_SENTINEL = "[ERROR]"
+
+def open_deepseek_stream(question, context=""):
+    return SESSION.post(DEEPSEEK_URL, data=build_deepseek_body(question, context, stream=True), stream=True, timeout=30)
+
+def ask_deepseek_stream(response, question, context=""):
+    try:
+        response.encoding = 'utf-8'
+        parts = []
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data: "):
+                continue
+            data = line[len("data: "):]
+            if data == "[DONE]":
+                break
+            
+            text = orjson.loads(data)["choices"][0]["delta"].get("content") or ""
+            if text:
+                parts.append(text)
+                yield text
+        
+        if parts:
+            cache_response(question, context, "".join(parts))
+            
+    except Exception as e:
+        log.error("DeepSeek stream failed: %s", e)
+        yield f"\n{STREAM_ERROR_SENTINEL} Network Error: {str(e)}\n"
+    finally:
+        response.close()
+
+# Search for relevant context in ChromaDB if available - only close matches are
+# kept, and only whole chunks, so the DeepSeek prompt carries at most
+# CONTEXT_MAX_RESULTS * CHUNK_TOKENS tokens of context without cutting a chunk short
+CONTEXT_CANDIDATES = 5
+CONTEXT_MAX_RESULTS = 2
+CONTEXT_MAX_DISTANCE = float(os.getenv("CONTEXT_MAX_DISTANCE", "0.6"))  # cosine distance
+
+def cosine_distance(collection, distance):
+    # FaissKnowledgeBase declares its space explicitly. Chroma collections record it in
+    # metadata and default to squared L2, which for the normalized MiniLM embeddings
+    # is 2x the cosine distance.
+    space = getattr(collection, "distance_space", None) or (collection.metadata or {}).get("hnsw:space", "l2")
+    return distance / 2 if space == "l2" else distance
+
+def retrieve_context(question):
+    context = ""
+    if chroma_collection:
+        try:
+            results = chroma_collection.query(
+                query_embeddings=[list(embed(question))],
+                n_results=CONTEXT_CANDIDATES,
+                include=["documents", "distances"]
+            )
+            
+            # Combine the closest matches
+            documents = results['documents'][0] if results['documents'] else []
+            distances = results['distances'][0] if results['distances'] else []
+            docs = [
+                doc for doc, distance in zip(documents, distances)
+                if cosine_distance(chroma_collection, distance) < CONTEXT_MAX_DISTANCE
+            ][:CONTEXT_MAX_RESULTS]
+            if docs:
+                context = "\n".join(docs)
+                log.debug("Found context: %.100s...", context)
+            else:
+                log.debug("No relevant context found in ChromaDB")
+        except Exception as e:
+            log.error("Error querying ChromaDB: %s. Continuing without context.", e)
+    else:
+        log.debug("No ChromaDB available - using general knowledge")
+    return context
+
+# Run the knowledge-base query alongside the semantic response-cache lookup,
+# so a cache hit never waits on retrieval. Both waits are bounded: a slow cache
+# lookup counts as a miss and slow retrieval falls back to no context.
+CACHE_LOOKUP_TIMEOUT = 0.1  # seconds
+CONTEXT_TIMEOUT = 5  # seconds
+
+def retrieve_context_and_cached_response(question):
+    if chroma_collection:
+        try:
+            embed(question)  # compute once so both lookups reuse the embedding
+        except Exception as e:
+            log.error("Error embedding question: %s", e)
+    
+    cache_future = EXECUTOR.submit(get_semantic_cached_response, question)
+    context_future = EXECUTOR.submit(retrieve_context, question)
+    try:
+        cached = cache_future.result(timeout=CACHE_LOOKUP_TIMEOUT)
+    except FutureTimeoutError:
+        log.warning("Response cache lookup timed out - treating as a miss")
+        cached = None
+    if cached is not None:
+        context_future.cancel()
+        return "", cached
+    
+    try:
+        context = context_future.result(timeout=CONTEXT_TIMEOUT)
+    except FutureTimeoutError:
+        log.warning("Context retrieval timed out - continuing without context")
+        context = ""
+    return context, get_exact_cached_response(question, context)
+
 # Flask routes
 @app.route('/api/chat', methods=['POST'])
 def chat():
     try:
-        data = request.get_json()
+        data = orjson.loads(request.get_data())
         question = data.get('question', '')
         
         if not question:
@@ -277,32 +800,17 @@ def chat():
                 'success': False
             })
         
-        print(f"Received question: {question}")
+        log.debug("Received question: %s", question)
         
-        # Search for relevant context in ChromaDB if available
-        context = ""
-        if chroma_collection:
-            try:
-                results = chroma_collection.query(
-                    query_texts=[question],
-                    n_results=3
-                )
-                
-                # Combine the context
-                if results['documents'] and results['documents'][0]:
-                    context = "\n".join(results['documents'][0])
-                    print(f"Found context: {context[:100]}..." if context else "No context found")
-                else:
-                    print("No relevant context found in ChromaDB")
-            except Exception as e:
-                print(f"Error querying ChromaDB: {e}. Continuing without context.")
+        # Serve repeated or near-identical questions from the response cache
+        context, response = retrieve_context_and_cached_response(question)
+        if response is not None:
+            log.debug("Serving response from cache")
         else:
-            print("No ChromaDB available - using general knowledge")
-        
-        # Use context when asking DeepSeek
-        response = ask_deepseek(question, context)
+            # Use context when asking DeepSeek
+            response = ask_deepseek(question, context)
         
-        print(f"Generated response: {response[:100]}..." if len(response) > 100 else f"Generated response: {response}")
+        log.debug("Generated response: %.100s", response)
         
         return jsonify({
             'response': response,
@@ -311,74 +819,154 @@ def chat():
         
     except Exception as e:
         error_msg = f"Server Error: {str(e)}"
-        print(error_msg)
+        log.exception(error_msg)
+        return jsonify({
+            'response': error_msg,
+            'success': False
+        })
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    try:
+        data = orjson.loads(request.get_data())
+        question = data.get('question', '')
+        
+        if not question:
+            return jsonify({
+                'response': "Please provide a question",
+                'success': False
+            })
+        
+        log.debug("Received question (stream): %s", question)
+        
+        context, cached = retrieve_context_and_cached_response(question)
+        if cached is not None:
+            log.debug("Serving response from cache")
+            return Response(cached, mimetype='text/plain')
+        
+        if not API_KEY:
+            return jsonify({
+                'response': "Error: API key not configured. Please check your .env file.",
+                'success': False
+            }), 500
+        
+        try:
+            upstream = open_deepseek_stream(question, context)
+        except Exception as e:
+            return jsonify({
+                'response': f"Network Error: {str(e)}",
+                'success': False
+            }), 502
+        
+        if upstream.status_code != 200:
+            error_msg = deepseek_error_message(upstream)
+            upstream.close()
+            return jsonify({
+                'response': error_msg,
+                'success': False
+            }), 502
+        
+        return Response(
+            stream_with_context(ask_deepseek_stream(upstream, question, context)),
+            mimetype='text/plain'
+        )
+        
+    except Exception as e:
+        error_msg = f"Server Error: {str(e)}"
+        log.exception(error_msg)
         return jsonify({
             'response': error_msg,
             'success': False
         })
 
+# Document file status - files rarely change while running, so re-check at most every few seconds
+@lru_cache(maxsize=1)
+def _document_status(ttl_bucket):
+    exists_my_data = os.path.exists(DOC_PATH_MYDATA)
+    exists_current = os.path.exists(DOC_PATH_CUR)
+    return {
+        'exists_my_data': exists_my_data,
+        'exists_current': exists_current,
+        'size_my_data': os.path.getsize(DOC_PATH_MYDATA) if exists_my_data else 0,
+        'size_current': os.path.getsize(DOC_PATH_CUR) if exists_current else 0
+    }
+
+def document_status():
+    return _document_status(int(time.time() // DOC_STATUS_TTL))
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    api_key = os.getenv('DEEPSEEK_API_KEY')
+    global _KEY_OK
+    
+    # Only call DeepSeek when explicitly asked, and don't cache failures
+    if request.args.get('deep') == '1' and API_KEY:
+        _KEY_OK = test_deepseek_key(API_KEY)
+        if not _KEY_OK:
+            test_deepseek_key.cache_clear()
     
     # Check if document exists in either location
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    doc_exists_my_data = os.path.exists(os.path.join(current_dir, "my_data", "MLTrainingDoc.txt"))
-    doc_exists_current = os.path.exists(os.path.join(current_dir, "MLTrainingDoc.txt"))
+    doc_status = document_status()
+    doc_exists_my_data = doc_status['exists_my_data']
+    doc_exists_current = doc_status['exists_current']
     doc_exists = doc_exists_my_data or doc_exists_current
     
     return jsonify({
         'status': 'healthy',
-        'api_configured': bool(api_key),
-        'api_key_valid': api_key is not None and api_key != 'your_deepseek_api_key_here',
+        'api_configured': bool(API_KEY),
+        'api_key_valid': API_KEY is not None and API_KEY != 'your_deepseek_api_key_here',
+        'api_key_working': _KEY_OK,
         'chromadb_connected': chroma_collection is not None,
-        'document_loaded': chroma_collection is not None and bool(chroma_collection.get()['ids']) if chroma_collection else False,
+        'document_loaded': chroma_collection is not None and chroma_collection.count() > 0,
         'document_exists': doc_exists,
         'document_location': 'my_data' if doc_exists_my_data else 'current' if doc_exists_current else 'not_found'
     })
 
 @app.route('/api/debug', methods=['GET'])
 def debug_info():
-    api_key = os.getenv('DEEPSEEK_API_KEY')
-    
     # Check document locations
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    doc_path_my_data = os.path.join(current_dir, "my_data", "MLTrainingDoc.txt")
-    doc_path_current = os.path.join(current_dir, "MLTrainingDoc.txt")
-    
-    doc_exists_my_data = os.path.exists(doc_path_my_data)
-    doc_exists_current = os.path.exists(doc_path_current)
-    doc_size_my_data = os.path.getsize(doc_path_my_data) if doc_exists_my_data else 0
-    doc_size_current = os.path.getsize(doc_path_current) if doc_exists_current else 0
+    doc_status = document_status()
     
     return jsonify({
-        'api_key_exists': bool(api_key),
-        'api_key_prefix': api_key[:10] + '...' if api_key else None,
+        'api_key_exists': bool(API_KEY),
+        'api_key_prefix': API_KEY[:10] + '...' if API_KEY else None,
         'current_directory': os.getcwd(),
         'env_file_exists': os.path.exists('.env'),
         'chromadb_status': 'connected' if chroma_collection else 'disconnected',
-        'document_exists_my_data': doc_exists_my_data,
-        'document_exists_current': doc_exists_current,
-        'document_size_my_data': doc_size_my_data,
-        'document_size_current': doc_size_current,
-        'chromadb_path': os.path.join(os.getcwd(), "chroma_db") if chroma_collection else None
+        'document_exists_my_data': doc_status['exists_my_data'],
+        'document_exists_current': doc_status['exists_current'],
+        'document_size_my_data': doc_status['size_my_data'],
+        'document_size_current': doc_status['size_current'],
+        'chromadb_path': CHROMA_PATH if chroma_collection else None
     })
 
 @app.route('/api/reset-chroma', methods=['POST'])
 def reset_chroma():
     """Endpoint to reset ChromaDB (useful for development)"""
     try:
-        global chroma_collection
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        chroma_path = os.path.join(current_dir, "chroma_db")
+        global chroma_collection, response_cache
+        if os.getenv('CHROMA_HOST'):
+            client = create_chroma_client()
+            for name in ("andy_knowledge_base", "andy_response_cache"):
+                try:
+                    client.delete_collection(name)
+                except Exception:
+                    pass
+            log.info("Reset ChromaDB collections on server")
+        elif os.path.exists(CHROMA_PATH):
+            shutil.rmtree(CHROMA_PATH)
+            log.info("Reset ChromaDB database")
         
-        if os.path.exists(chroma_path):
-            shutil.rmtree(chroma_path)
-            print("Reset ChromaDB database")
+        if USE_FAISS and faiss is not None:
+            shutil.rmtree(FAISS_DIR, ignore_errors=True)
+            chroma_collection = setup_faiss()
+        else:
+            chroma_collection = setup_chromadb()
+            if chroma_collection:
+                load_document_to_chroma(chroma_collection)
         
-        chroma_collection = setup_chromadb()
-        if chroma_collection:
-            load_document_to_chroma(chroma_collection)
+        with _cache_lock:
+            _exact_cache.clear()
+        response_cache = setup_response_cache() if chroma_collection else None
         
         return jsonify({
             'success': True,
@@ -390,12 +978,14 @@ def reset_chroma():
             'message': f'Error resetting ChromaDB: {str(e)}'
         })
 
+# Local development server only - production runs under gunicorn via wsgi.py
 if __name__ == '__main__':
     print("=" * 50)
     print("Starting Flask server...")
     print("Server will be available at: http://localhost:5000")
     print("API endpoints:")
     print("  - POST /api/chat")
+    print("  - POST /api/chat/stream")
     print("  - GET  /api/health")
     print("  - GET  /api/debug")
     print("  - POST /api/reset-chroma")
@@ -0,0 +1,17 @@
+import os
+
+# Chat requests spend almost all their time waiting on DeepSeek, so serve them
+# from gevent workers where each in-flight request is a cheap greenlet instead
+# of tying up a worker process or thread. Run with wsgi:app, which applies the
+# gevent monkey patches before the app is imported and moves ONNX embedding
+# inference onto gevent's native-thread pool, so it doesn't block the event loop
+# shared by all of a worker's connections. Chroma calls stay in greenlets.
+# A single worker keeps one copy of the ChromaDB index in memory; set
+# WEB_CONCURRENCY higher when using a standalone Chroma server (CHROMA_HOST).
+worker_class = "gevent"
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "1000"))
+
+# DeepSeek calls time out after 30s (plus retries), give them room to finish
+timeout = 60
+keepalive = 5
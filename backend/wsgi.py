@@ -0,0 +1,18 @@
+# Production entry point: gunicorn -c gunicorn.conf.py wsgi:app
+# gevent must patch the standard library before anything else is imported so
+# that requests/urllib3 sockets yield to other greenlets while waiting on DeepSeek
+from gevent import monkey
+monkey.patch_all()
+
+from gevent.threadpool import ThreadPoolExecutor  # noqa: E402
+
+import app as andy  # noqa: E402
+
+# Run ONNX inference on native OS threads so it doesn't block every other
+# connection on the worker; gevent's executor futures wait cooperatively.
+# The model is loaded here first so the threads only ever run the pure
+# inference call (Chroma and logging stay in greenlets, see app.EMBED_EXECUTOR).
+andy.EMBED_FN(["warm up"])
+andy.EMBED_EXECUTOR = ThreadPoolExecutor(max_workers=4)
+
+app = andy.app